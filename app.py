@@ -2,6 +2,7 @@ import re
 import io
 import os
 import json
+import hashlib
 from pathlib import Path
 
 import numpy as np
@@ -14,10 +15,10 @@ import streamlit as st
 # ---------------------------------------------------------
 
 
-def parse_area_m2(dimensions: str):
-    """Convert '841mm x 1189mm' → m² (assumes mm × mm)."""
+def parse_dimensions_mm(dimensions: str):
+    """Convert '841mm x 1189mm' → (841.0, 1189.0); (nan, nan) if unparseable."""
     if pd.isna(dimensions):
-        return np.nan
+        return np.nan, np.nan
     s = (
         str(dimensions)
         .lower()
@@ -27,12 +28,18 @@ def parse_area_m2(dimensions: str):
     )
     parts = s.split("x")
     if len(parts) != 2:
-        return np.nan
+        return np.nan, np.nan
     try:
         w = float(parts[0])
         h = float(parts[1])
     except Exception:
-        return np.nan
+        return np.nan, np.nan
+    return w, h
+
+
+def parse_area_m2(dimensions: str):
+    """Convert '841mm x 1189mm' → m² (assumes mm × mm)."""
+    w, h = parse_dimensions_mm(dimensions)
     return (w * h) / 1_000_000.0
 
 
@@ -197,6 +204,414 @@ def fmt_money(x):
     return f"${x:,.2f}"
 
 
+def detect_runs_col(df: pd.DataFrame):
+    """Find the "runs per annum" column (Column J in your sheet, or anything with 'run' in name)."""
+    # Prefer an exact friendly name if present
+    for c in df.columns:
+        if str(c).strip().lower() in ["approx runs p.a", "approx runs pa", "runs per annum"]:
+            return c
+    run_candidates = [c for c in df.columns if "run" in str(c).lower()]
+    if run_candidates:
+        return run_candidates[0]
+    if len(df.columns) > 9:
+        # Fallback: 10th column (index 9) = Column J
+        return df.columns[9]
+    return None
+
+
+def prepare_lines(df: pd.DataFrame, runs_col) -> pd.DataFrame:
+    """Base per-annum columns (area, stock, sides, quantity) for an uploaded tender."""
+    data = df.copy()
+    if runs_col:
+        data["Runs per Annum"] = pd.to_numeric(df[runs_col], errors="coerce")
+    else:
+        data["Runs per Annum"] = np.nan
+
+    data["Area m² (each)"] = data["Dimensions"].apply(parse_area_m2)
+    data["Stock Name"] = data["Print/Stock Specifications"].apply(extract_stock_name)
+    data["Sided (auto)"] = data["Print/Stock Specifications"].apply(detect_sides)
+    data["Double Sided?"] = data["Sided (auto)"] == "Double Sided"
+    data["Quantity"] = data["Total Annual Volume"]
+    data["Total Area m²"] = data["Area m² (each)"] * data["Quantity"]
+    return data
+
+
+def compute_line_values(data: pd.DataFrame, group_prices, stock_prices, double_mult: float) -> pd.DataFrame:
+    """Price per m² (stock override wins over group price), sided multiplier and line value."""
+    stock_p = pd.to_numeric(data["Stock Name"].map(stock_prices), errors="coerce").fillna(0.0)
+    group_p = pd.to_numeric(data["Material Group"].map(group_prices), errors="coerce").fillna(0.0)
+    data["Price per m²"] = np.where(stock_p > 0, stock_p, group_p)
+    data["Sided Multiplier"] = np.where(data["Double Sided?"].astype(bool), double_mult, 1.0)
+    data["Line Value (ex GST)"] = (
+        data["Total Area m²"] * data["Price per m²"] * data["Sided Multiplier"]
+    )
+    return data
+
+
+# ---------------------------------------------------------
+# Production nesting (shelf packing onto sheets / rolls)
+# ---------------------------------------------------------
+
+
+STOCK_FORMATS = ["Sheet", "Roll"]
+SHEET_GROUP_HINTS = ("screenboard", "corflute", "acrylic", "pvc", "hips", "acm", "aluminium", "maxi-t", "panel", "foam")
+
+
+def default_stock_size(group_key: str):
+    """(format, width mm, length mm) guess for a group: rigid boards on 2440×1220, the rest on 1370mm rolls."""
+    g = str(group_key).lower()
+    if any(h in g for h in SHEET_GROUP_HINTS):
+        return "Sheet", 2440.0, 1220.0
+    return "Roll", 1370.0, np.nan
+
+
+def _next_fit_starts(sizes: np.ndarray, capacity: float) -> np.ndarray:
+    """Start index of each bin when `sizes` are laid end to end with next-fit.
+
+    Loops once per bin (not per item): each bin's end is found with a binary
+    search on the running total.
+    """
+    cum = np.concatenate([[0.0], np.cumsum(sizes)])
+    starts = []
+    start, n = 0, len(sizes)
+    while start < n:
+        starts.append(start)
+        end = int(np.searchsorted(cum, cum[start] + capacity + 1e-6, side="right")) - 1
+        start = max(end, start + 1)
+    return np.array(starts, dtype=int)
+
+
+def _shelf_heights(widths: np.ndarray, heights: np.ndarray, shelf_width: float) -> np.ndarray:
+    """Next-fit decreasing-height shelves; returns the height of each shelf."""
+    order = np.argsort(-heights, kind="stable")
+    starts = _next_fit_starts(widths[order], shelf_width)
+    return heights[order][starts]
+
+
+def _best_fit_across(w, h, stock_w, stock_l):
+    """Pieces across / down the stock for the better of the two orientations (vectorised).
+
+    For rolls (`stock_l` is inf) the better orientation is the one using the least roll length per piece.
+    """
+    across_a = np.floor(stock_w / w)
+    across_b = np.floor(stock_w / h)
+    if np.isinf(stock_l):
+        len_a = np.where(across_a > 0, h / np.maximum(across_a, 1), np.inf)
+        len_b = np.where(across_b > 0, w / np.maximum(across_b, 1), np.inf)
+        use_b = len_b < len_a
+        down = np.full_like(w, np.inf)
+    else:
+        per_a = across_a * np.floor(stock_l / h)
+        per_b = across_b * np.floor(stock_l / w)
+        use_b = per_b > per_a
+        down = np.where(use_b, np.floor(stock_l / w), np.floor(stock_l / h))
+    across = np.where(use_b, across_b, across_a)
+    piece_w = np.where(use_b, h, w)
+    piece_h = np.where(use_b, w, h)
+    return across, down, piece_w, piece_h
+
+
+def nest_bucket(w, h, n, fmt: str, stock_w: float, stock_l: float, gap: float = 0.0):
+    """Nest one print run of one material group.
+
+    `w`, `h`, `n` are arrays of piece size (mm) and pieces per run for each line.
+    Each line is first tiled on its own (full sheets / full rows); the leftovers
+    are pooled as blocks and packed together on shelves. Pieces larger than the
+    stock are tiled into panels. Returns (sheets, roll length in mm) for the run.
+    """
+    stock_w = stock_w + gap
+    stock_l = np.inf if fmt == "Roll" else stock_l + gap
+    w = np.asarray(w, dtype=float) + gap
+    h = np.asarray(h, dtype=float) + gap
+    n = np.asarray(n, dtype=float)
+
+    across, down, pw, ph = _best_fit_across(w, h, stock_w, stock_l)
+    fits = across * np.where(np.isinf(down), 1, down) > 0
+
+    # Oversize pieces: tile into panels of the stock size.
+    ow, oh, on = w[~fits] - gap, h[~fits] - gap, n[~fits]
+    sw, sl = stock_w - gap, stock_l - gap
+    if fmt == "Roll":
+        over_len = float((np.minimum(np.ceil(ow / sw) * oh, np.ceil(oh / sw) * ow) * on).sum())
+        over_sheets = 0.0
+    else:
+        panels = np.minimum(np.ceil(ow / sw) * np.ceil(oh / sl), np.ceil(oh / sw) * np.ceil(ow / sl))
+        over_sheets = float((panels * on).sum())
+        over_len = 0.0
+
+    across, down, pw, ph, n = across[fits], down[fits], pw[fits], ph[fits], n[fits]
+    if fmt == "Roll":
+        full_rows = n // across
+        full_len = float((full_rows * ph).sum())
+        partial = n - full_rows * across
+        block_w, block_h = partial * pw, ph
+        keep = partial > 0
+        shelves = _shelf_heights(block_w[keep], block_h[keep], stock_w)
+        return over_sheets, full_len + float(shelves.sum()) + over_len
+
+    per_sheet = across * down
+    full_sheets = float((n // per_sheet).sum())
+    rem = n % per_sheet
+    rows = rem // across
+    partial = rem - rows * across
+    block_w = np.concatenate([across * pw, partial * pw])
+    block_h = np.concatenate([rows * ph, ph])
+    keep = np.concatenate([rows > 0, partial > 0])
+    shelves = _shelf_heights(block_w[keep], block_h[keep], stock_w)
+    pool_sheets = len(_next_fit_starts(shelves, stock_l))
+    return full_sheets + pool_sheets + over_sheets, over_len
+
+
+@st.cache_data(show_spinner=False)
+def estimate_nesting(items: pd.DataFrame, stock_sizes: pd.DataFrame, gap_mm: float = 0.0) -> pd.DataFrame:
+    """Sheets / roll metres, yield and waste per material group.
+
+    `items` has one row per line: Material Group, Width mm, Height mm, Quantity, Runs.
+    `stock_sizes` has Material Group, Format, Stock Width mm, Stock Length mm.
+    Lines are nested per group and per run (pieces per run = ceil(quantity / runs)),
+    and the per-run result is scaled back up to per annum.
+    """
+    items = items.dropna(subset=["Width mm", "Height mm", "Quantity"])
+    items = items[(items["Width mm"] > 0) & (items["Height mm"] > 0) & (items["Quantity"] > 0)].copy()
+    items["Runs"] = items["Runs"].where(items["Runs"] > 0, 1.0).fillna(1.0)
+    items["Per Run"] = np.ceil(items["Quantity"] / items["Runs"])
+
+    sizes = stock_sizes.set_index("Material Group")
+    rows = []
+    for group, g_items in items.groupby("Material Group", sort=True):
+        if group not in sizes.index:
+            continue
+        fmt, stock_w, stock_l = sizes.loc[group, ["Format", "Stock Width mm", "Stock Length mm"]]
+        if fmt not in STOCK_FORMATS:
+            continue
+        stock_w = float(stock_w)
+        stock_l = float(stock_l) if fmt == "Sheet" else np.nan
+        if not stock_w > 0 or (fmt == "Sheet" and not stock_l > 0):
+            continue
+        sheets = length_mm = 0.0
+        for runs, r_items in g_items.groupby("Runs", sort=False):
+            run_sheets, run_len = nest_bucket(
+                r_items["Width mm"].to_numpy(),
+                r_items["Height mm"].to_numpy(),
+                r_items["Per Run"].to_numpy(),
+                fmt,
+                stock_w,
+                stock_l,
+                gap_mm,
+            )
+            sheets += run_sheets * runs
+            length_mm += run_len * runs
+        # Per Run is rounded up for packing only; the item area is the real annual quantity.
+        item_m2 = float((g_items["Width mm"] * g_items["Height mm"] * g_items["Quantity"]).sum()) / 1e6
+        if fmt == "Sheet":
+            stock_m2 = sheets * stock_w * stock_l / 1e6
+            size_label = f"{stock_w:g}×{stock_l:g}mm"
+        else:
+            stock_m2 = length_mm * stock_w / 1e6
+            size_label = f"{stock_w:g}mm roll"
+        rows.append(
+            {
+                "Material Group": group,
+                "Format": fmt,
+                "Stock Size": size_label,
+                "Lines Nested": len(g_items),
+                "Sheets p.a.": sheets if fmt == "Sheet" else np.nan,
+                "Roll Metres p.a.": length_mm / 1000.0 if fmt == "Roll" else np.nan,
+                "Item m²": item_m2,
+                "Stock m²": stock_m2,
+                "Yield %": 100.0 * item_m2 / stock_m2 if stock_m2 > 0 else np.nan,
+                "Waste m²": stock_m2 - item_m2,
+            }
+        )
+    return pd.DataFrame(
+        rows,
+        columns=[
+            "Material Group", "Format", "Stock Size", "Lines Nested", "Sheets p.a.",
+            "Roll Metres p.a.", "Item m²", "Stock m²", "Yield %", "Waste m²",
+        ],
+    )
+
+
+# ---------------------------------------------------------
+# Revision compare (line hashing & diff)
+# ---------------------------------------------------------
+
+
+CONTENT_KEY_COLS = ["Dimensions", "Print/Stock Specifications", "Total Annual Volume", "Runs per Annum"]
+KEY_MODES = ["Lot ID", "Content key"]
+
+
+def _normalise_key_part(series: pd.Series) -> pd.Series:
+    """Exact text form of a column that survives Excel re-saves (case, spacing, 100 vs 100.0).
+
+    Tender columns repeat a lot, so only the distinct values are normalised.
+    """
+    codes, uniques = pd.factorize(series, use_na_sentinel=False)
+    norm = _normalise_values(pd.Series(uniques, dtype=object if series.dtype == object else None))
+    return pd.Series(norm.to_numpy()[codes], index=series.index)
+
+
+def _normalise_values(series: pd.Series) -> pd.Series:
+    num = pd.to_numeric(series, errors="coerce")
+    if pd.api.types.is_numeric_dtype(series):
+        out = pd.Series(np.nan, index=series.index, dtype=object)
+    else:
+        out = series.astype(str).str.strip().str.lower().str.replace(r"\s+", " ", regex=True).astype(object)
+    whole = num.notna() & (num % 1 == 0) & (num.abs() < 2**63)
+    frac = num.notna() & ~whole
+    # Numbers stay as Python ints / floats; hashing stringifies them exactly ("5", "0.5").
+    out[whole] = num[whole].astype("int64").astype(object)
+    out[frac] = num[frac].astype(object)
+    return out
+
+
+def _key_parts(frame: pd.DataFrame) -> pd.DataFrame:
+    """Normalised Lot ID + content key columns, computed once per revision; missing columns are blank."""
+    return pd.DataFrame(
+        {c: _normalise_key_part(frame[c]) if c in frame.columns else "" for c in ["Lot ID", *CONTENT_KEY_COLS]},
+        index=frame.index,
+    )
+
+
+def _hash_rows(parts: pd.DataFrame, cols) -> pd.Series:
+    """uint64 hash per row over the given (normalised) columns."""
+    return pd.util.hash_pandas_object(parts[cols], index=False)
+
+
+def _with_occurrence(key: pd.Series) -> pd.Series:
+    """Make repeated keys unique by numbering their occurrences (1st, 2nd, ...)."""
+    occurrence = key.groupby(key).cumcount()
+    return pd.util.hash_pandas_object(pd.DataFrame({"k": key, "n": occurrence}), index=False)
+
+
+def key_columns(data: pd.DataFrame) -> pd.DataFrame:
+    """Just the columns line keys are built from (keeps cache hashing cheap)."""
+    return data[[c for c in ["Lot ID", *CONTENT_KEY_COLS] if c in data.columns]]
+
+
+def _blank_lot_ids(parts: pd.DataFrame) -> np.ndarray:
+    return (parts["Lot ID"].isna() | (parts["Lot ID"] == "")).to_numpy()
+
+
+@st.cache_data(show_spinner=False)
+def line_fingerprints(data: pd.DataFrame) -> pd.Series:
+    """Hash of a whole line (Lot ID + content key). Unchanged lines keep their fingerprint across revisions."""
+    cols = (["Lot ID"] if "Lot ID" in data.columns else []) + CONTENT_KEY_COLS
+    return _with_occurrence(_hash_rows(_key_parts(data), cols))
+
+
+def _has_repeated_lot_ids(parts: pd.DataFrame) -> bool:
+    return bool(parts.loc[~_blank_lot_ids(parts), "Lot ID"].duplicated().any())
+
+
+def _to_positions(positions: np.ndarray, rows: pd.Series) -> np.ndarray:
+    """Map row numbers of a subset back to positions in the full frame (NaN stays NaN)."""
+    rows = rows.to_numpy(dtype=float)
+    out = np.full(len(rows), np.nan)
+    found = ~np.isnan(rows)
+    out[found] = positions[rows[found].astype(int)]
+    return out
+
+
+def _match_rows(prev_key, curr_key) -> pd.DataFrame:
+    """Outer hash join of two key arrays; prev_row / curr_row are positions (NaN when unmatched)."""
+    left = pd.DataFrame({"key": np.asarray(prev_key), "prev_row": np.arange(len(prev_key))})
+    right = pd.DataFrame({"key": np.asarray(curr_key), "curr_row": np.arange(len(curr_key))})
+    return left.merge(right, on="key", how="outer")
+
+
+def _content_key_diff(prev: pd.DataFrame, curr: pd.DataFrame) -> pd.DataFrame:
+    """Diff by content key in two passes.
+
+    1. Exact match on dimensions, spec, volume and runs → Unchanged, so reordering
+       or inserting lines does not disturb the other pairings.
+    2. The leftovers are paired on dimensions + spec → Modified; anything still
+       unmatched is Added or Removed.
+
+    `prev` / `curr` are normalised key parts (see `_key_parts`).
+    """
+    exact = _match_rows(
+        _with_occurrence(_hash_rows(prev, CONTENT_KEY_COLS)),
+        _with_occurrence(_hash_rows(curr, CONTENT_KEY_COLS)),
+    )
+    unchanged = exact.dropna(subset=["prev_row", "curr_row"]).assign(Change="Unchanged")
+
+    left_prev = exact.loc[exact["curr_row"].isna(), "prev_row"].to_numpy(dtype=int)
+    left_curr = exact.loc[exact["prev_row"].isna(), "curr_row"].to_numpy(dtype=int)
+    paired = _match_rows(
+        _with_occurrence(_hash_rows(prev.iloc[left_prev], CONTENT_KEY_COLS[:2])),
+        _with_occurrence(_hash_rows(curr.iloc[left_curr], CONTENT_KEY_COLS[:2])),
+    )
+    paired["Change"] = np.select(
+        [paired["prev_row"].isna(), paired["curr_row"].isna()], ["Added", "Removed"], default="Modified"
+    )
+    paired["prev_row"] = _to_positions(left_prev, paired["prev_row"])
+    paired["curr_row"] = _to_positions(left_curr, paired["curr_row"])
+    return pd.concat([unchanged, paired], ignore_index=True)[["Change", "prev_row", "curr_row"]]
+
+
+def _lot_id_diff(prev: pd.DataFrame, curr: pd.DataFrame) -> pd.DataFrame:
+    """Diff by Lot ID; content decides Modified vs Unchanged. Blank Lot IDs fall back to the content key.
+
+    `prev` / `curr` are normalised key parts (see `_key_parts`).
+    """
+    prev_pos = np.flatnonzero(~_blank_lot_ids(prev))
+    curr_pos = np.flatnonzero(~_blank_lot_ids(curr))
+    prev_ided, curr_ided = prev.iloc[prev_pos], curr.iloc[curr_pos]
+    merged = _match_rows(_hash_rows(prev_ided, ["Lot ID"]), _hash_rows(curr_ided, ["Lot ID"]))
+    prev_content = _hash_rows(prev_ided, CONTENT_KEY_COLS).to_numpy()
+    curr_content = _hash_rows(curr_ided, CONTENT_KEY_COLS).to_numpy()
+    both = merged["prev_row"].notna() & merged["curr_row"].notna()
+    same = np.zeros(len(merged), dtype=bool)
+    same[both.to_numpy()] = (
+        prev_content[merged.loc[both, "prev_row"].to_numpy(dtype=int)]
+        == curr_content[merged.loc[both, "curr_row"].to_numpy(dtype=int)]
+    )
+    merged["Change"] = np.select(
+        [merged["prev_row"].isna(), merged["curr_row"].isna(), same],
+        ["Added", "Removed", "Unchanged"],
+        default="Modified",
+    )
+    merged["prev_row"] = _to_positions(prev_pos, merged["prev_row"])
+    merged["curr_row"] = _to_positions(curr_pos, merged["curr_row"])
+
+    prev_blank = np.flatnonzero(_blank_lot_ids(prev))
+    curr_blank = np.flatnonzero(_blank_lot_ids(curr))
+    blank = _content_key_diff(prev.iloc[prev_blank], curr.iloc[curr_blank])
+    blank["prev_row"] = _to_positions(prev_blank, blank["prev_row"])
+    blank["curr_row"] = _to_positions(curr_blank, blank["curr_row"])
+    return pd.concat([merged[["Change", "prev_row", "curr_row"]], blank], ignore_index=True)
+
+
+@st.cache_data(show_spinner=False)
+def diff_revisions(prev: pd.DataFrame, curr: pd.DataFrame, key_mode: str):
+    """Classify lines as Added / Removed / Modified / Unchanged.
+
+    Only hash joins are used, so it is linear in the number of lines.
+    Lot ID matching needs a Lot ID column in both revisions with no repeated IDs,
+    otherwise the content key is used; lines with a blank Lot ID are matched by
+    content key either way.
+
+    Returns (changes, key mode used); `changes` has one row per line with
+    positional row numbers into `prev` and `curr`.
+    """
+    prev_parts, curr_parts = _key_parts(prev), _key_parts(curr)
+    if key_mode == "Lot ID" and (
+        "Lot ID" not in prev.columns
+        or "Lot ID" not in curr.columns
+        or _has_repeated_lot_ids(prev_parts)
+        or _has_repeated_lot_ids(curr_parts)
+    ):
+        key_mode = "Content key"
+    if key_mode == "Lot ID":
+        changes = _lot_id_diff(prev_parts, curr_parts)
+    else:
+        changes = _content_key_diff(prev_parts, curr_parts)
+    changes["prev_row"] = changes["prev_row"].astype("Int64")
+    changes["curr_row"] = changes["curr_row"].astype("Int64")
+    return changes.reset_index(drop=True), key_mode
+
+
 # ---------------------------------------------------------
 # Price memory (persist across runs in a local JSON file)
 # ---------------------------------------------------------
@@ -319,6 +734,19 @@ with header_cols[1]:
     st.caption("Option B grouping · per-annum & per-run SQM · ADS orange & navy theme")
 
 uploaded = st.file_uploader("Upload tender Excel", type=["xlsx", "xls"])
+with st.expander("🔁 Compare with a previous revision", expanded=False):
+    prev_uploaded = st.file_uploader(
+        "Previous revision Excel (optional)",
+        type=["xlsx", "xls"],
+        help="Upload the earlier revision of this tender to see added / removed / modified lines.",
+        key="prev_revision_upload",
+    )
+    key_mode = st.radio(
+        "Match lines by",
+        KEY_MODES,
+        horizontal=True,
+        help="Lot ID if both revisions carry it; content key uses dimensions + spec.",
+    )
 if not uploaded:
     st.info("Please upload an Excel file with at least: Dimensions, Print/Stock Specifications, Total Annual Volume.")
     st.stop()
@@ -331,35 +759,35 @@ if missing:
     st.error(f"Missing required columns: {missing}")
     st.stop()
 
-data = df.copy()
-
-# Detect "runs per annum" column (Column J in your sheet, or anything with 'run' in name)
-runs_col = None
-# Prefer an exact friendly name if present
-for c in df.columns:
-    if c.strip().lower() in ["approx runs p.a", "approx runs pa", "runs per annum"]:
-        runs_col = c
-        break
-if runs_col is None:
-    run_candidates = [c for c in df.columns if "run" in c.lower()]
-    if run_candidates:
-        runs_col = run_candidates[0]
-    elif len(df.columns) > 9:
-        # Fallback: 10th column (index 9) = Column J
-        runs_col = df.columns[9]
-
-if runs_col:
-    data["Runs per Annum"] = pd.to_numeric(df[runs_col], errors="coerce")
-else:
-    data["Runs per Annum"] = np.nan
+runs_col = detect_runs_col(df)
 
 # Base per-annum calculations
-data["Area m² (each)"] = data["Dimensions"].apply(parse_area_m2)
-data["Stock Name"] = data["Print/Stock Specifications"].apply(extract_stock_name)
-data["Sided (auto)"] = data["Print/Stock Specifications"].apply(detect_sides)
-data["Double Sided?"] = data["Sided (auto)"] == "Double Sided"
-data["Quantity"] = data["Total Annual Volume"]
-data["Total Area m²"] = data["Area m² (each)"] * data["Quantity"]
+data = prepare_lines(df, runs_col)
+
+prev_data = None
+if prev_uploaded:
+    prev_df = pd.read_excel(prev_uploaded)
+    prev_missing = [c for c in required_cols if c not in prev_df.columns]
+    if prev_missing:
+        st.warning(f"Previous revision is missing required columns: {prev_missing}")
+    else:
+        prev_data = prepare_lines(prev_df, detect_runs_col(prev_df))
+
+# Overrides and group assignments are remembered per line / stock so a reissued
+# revision keeps them for every line that did not change.
+ds_overrides = st.session_state.setdefault("ds_overrides", {})
+group_memory = st.session_state.setdefault("group_memory", {})
+
+line_fps = line_fingerprints(key_columns(data))
+tender_sig = hashlib.md5(line_fps.to_numpy().tobytes()).hexdigest()[:12]
+
+# Remembered overrides seed the double-sided editor once per tender. The seed must
+# not change while the tender is open, or the editor would drop its pending edits.
+if st.session_state.get("ds_seed_sig") != tender_sig:
+    remembered_ds = line_fps.map(ds_overrides)
+    st.session_state["ds_seed"] = remembered_ds.where(remembered_ds.notna(), data["Double Sided?"]).astype(bool)
+    st.session_state["ds_seed_sig"] = tender_sig
+data["Double Sided?"] = st.session_state["ds_seed"].to_numpy()
 
 # Sidebar option: show per-run view
 st.sidebar.header("⚙️ Options")
@@ -390,15 +818,17 @@ ds_cols = [
     "Double Sided?",
 ]
 if runs_col:
-    ds_cols.append("Runs per Annum")
-    if use_runs:
-        ds_cols.append("Area m² per Run")
+    ds_cols.extend(["Runs per Annum", "Area m² per Run"])
 
 if "Lot ID" in data.columns:
     ds_cols.insert(0, "Lot ID")
 if "Item Description" in data.columns:
     ds_cols.insert(1, "Item Description")
 
+# Keep the editor's columns fixed and only hide the per-run column, so toggling
+# the per-run view does not reset the editor.
+ds_visible = [c for c in ds_cols if use_runs or c != "Area m² per Run"]
+
 st.markdown(
     '<span class="orange-chip">Tip</span> Use this table to override any auto-detected double-sided lines.',
     unsafe_allow_html=True,
@@ -407,16 +837,27 @@ st.markdown(
 edited_ds = st.data_editor(
     data[ds_cols],
     use_container_width=True,
-    num_rows="dynamic",
+    num_rows="fixed",
+    column_order=ds_visible,
     column_config={
         "Double Sided?": st.column_config.CheckboxColumn(
             "Double Sided?", help="Tick if the item is double-sided."
         )
     },
-    key="double_sided_editor",
+    key=f"double_sided_editor_{tender_sig}",
 )
 
-data["Double Sided?"] = edited_ds["Double Sided?"].fillna(False)
+edited_sides = edited_ds["Double Sided?"].reindex(data.index)
+data["Double Sided?"] = edited_sides.fillna(False).astype(bool)
+
+auto_ds = data["Sided (auto)"] == "Double Sided"
+for fp, auto, val in zip(line_fps, auto_ds, edited_sides):
+    if pd.isna(val):
+        continue
+    if val != auto:
+        ds_overrides[fp] = bool(val)
+    else:
+        ds_overrides.pop(fp, None)
 
 # ---------------------------------------------------------
 # 2. Material grouping (Option B)
@@ -433,7 +874,9 @@ if "groups_df" not in st.session_state:
             "Initial Group": [material_group_key_medium(s) for s in unique_stocks],
         }
     )
-    st.session_state["groups_df"]["Assigned Group"] = st.session_state["groups_df"]["Initial Group"]
+    st.session_state["groups_df"]["Assigned Group"] = [
+        group_memory.get(s, g) for s, g in zip(unique_stocks, st.session_state["groups_df"]["Initial Group"])
+    ]
 else:
     gdf = st.session_state["groups_df"]
     existing = set(gdf["Stock Name"])
@@ -445,7 +888,7 @@ else:
                 "Initial Group": [material_group_key_medium(s) for s in new_stocks],
             }
         )
-        new_rows["Assigned Group"] = new_rows["Initial Group"]
+        new_rows["Assigned Group"] = [group_memory.get(s, g) for s, g in zip(new_stocks, new_rows["Initial Group"])]
         gdf = pd.concat([gdf, new_rows], ignore_index=True)
     gdf = gdf[gdf["Stock Name"].isin(unique_stocks)].reset_index(drop=True)
     st.session_state["groups_df"] = gdf
@@ -509,10 +952,20 @@ with merge_col1:
             mask = groups_df["Assigned Group"].isin(merge_selection)
             groups_df.loc[mask, "Assigned Group"] = merge_target
             st.session_state["groups_df"] = groups_df
+            # Keep the stock size of the target if it was merged, else of the first merged group.
+            sizes_df = st.session_state.get("stock_sizes_df")
+            if sizes_df is not None:
+                source = merge_target if merge_target in merge_selection else merge_selection[0]
+                kept = sizes_df[sizes_df["Material Group"] == source].assign(**{"Material Group": merge_target})
+                sizes_df = sizes_df[~sizes_df["Material Group"].isin([*merge_selection, merge_target])]
+                st.session_state["stock_sizes_df"] = pd.concat([sizes_df, kept], ignore_index=True)
+                # Rows moved, so drop the editor's positional edits (already folded into stock_sizes_df).
+                st.session_state.pop("stock_sizes_editor", None)
             st.success(f"Merged {len(merge_selection)} groups into '{merge_target}'.")
 
 stock_to_group = dict(zip(groups_df["Stock Name"], groups_df["Assigned Group"]))
 data["Material Group"] = data["Stock Name"].map(stock_to_group).fillna("Unassigned")
+group_memory.update(stock_to_group)
 
 # ---------------------------------------------------------
 # 3. Pricing & double-sided loading
@@ -562,23 +1015,8 @@ double_loading_pct = st.sidebar.number_input(
 )
 
 
-def compute_unit_price(row):
-    group = row.get("Material Group", "")
-    stock = row.get("Stock Name", "")
-    sp = float(stock_prices.get(stock, 0.0) or 0.0)
-    if sp > 0:
-        return sp
-    return float(group_prices.get(group, 0.0) or 0.0)
-
-
-data["Price per m²"] = data.apply(compute_unit_price, axis=1)
-
 double_mult = 1.0 + double_loading_pct / 100.0
-data["Sided Multiplier"] = np.where(data["Double Sided?"], double_mult, 1.0)
-
-data["Line Value (ex GST)"] = (
-    data["Total Area m²"] * data["Price per m²"] * data["Sided Multiplier"]
-)
+data = compute_line_values(data, group_prices, stock_prices, double_mult)
 
 # Value per run (if runs per annum is available)
 if runs_col:
@@ -616,7 +1054,73 @@ display_group_summary = display_group_summary[
     ["Material Group", "Friendly Name", "Price per m²", "Materials", "Lines", "Total_Area_m2", "Group Value (ex GST)"]
 ]
 
-st.dataframe(display_group_summary, use_container_width=True)
+summary_tab, nesting_tab = st.tabs(["Group summary", "Production nesting"])
+
+with summary_tab:
+    st.dataframe(display_group_summary, use_container_width=True)
+
+with nesting_tab:
+    st.markdown(
+        '<span class="orange-chip">Estimate</span> Shelf-packs each group\'s items per run onto its stock size.',
+        unsafe_allow_html=True,
+    )
+
+    if "stock_sizes_df" not in st.session_state:
+        st.session_state["stock_sizes_df"] = pd.DataFrame(
+            columns=["Material Group", "Format", "Stock Width mm", "Stock Length mm"]
+        )
+    sizes_df = st.session_state["stock_sizes_df"]
+    new_groups = [g for g in group_names if g not in set(sizes_df["Material Group"])]
+    if new_groups:
+        new_sizes = pd.DataFrame(
+            [(g, *default_stock_size(g)) for g in new_groups],
+            columns=["Material Group", "Format", "Stock Width mm", "Stock Length mm"],
+        )
+        sizes_df = pd.concat([sizes_df, new_sizes], ignore_index=True)
+    sizes_df = sizes_df[sizes_df["Material Group"].isin(group_names)].reset_index(drop=True)
+    st.session_state["stock_sizes_df"] = sizes_df
+
+    with st.expander("Stock sizes per group", expanded=False):
+        sizes_df = st.data_editor(
+            sizes_df,
+            use_container_width=True,
+            num_rows="fixed",
+            column_config={
+                "Material Group": st.column_config.TextColumn(disabled=True),
+                "Format": st.column_config.SelectboxColumn("Format", options=STOCK_FORMATS),
+                "Stock Width mm": st.column_config.NumberColumn(
+                    "Stock Width mm", min_value=0.0, help="Board width, or roll width for rolls."
+                ),
+                "Stock Length mm": st.column_config.NumberColumn(
+                    "Stock Length mm", min_value=0.0, help="Board length (ignored for rolls)."
+                ),
+            },
+            key="stock_sizes_editor",
+        )
+        st.session_state["stock_sizes_df"] = sizes_df
+        nest_gap = st.number_input("Gap between items (mm)", min_value=0.0, value=5.0, step=1.0)
+
+    item_dims = data["Dimensions"].apply(parse_dimensions_mm)
+    nest_items = pd.DataFrame(
+        {
+            "Material Group": data["Material Group"],
+            "Width mm": [d[0] for d in item_dims],
+            "Height mm": [d[1] for d in item_dims],
+            "Quantity": pd.to_numeric(data["Quantity"], errors="coerce"),
+            "Runs": data["Runs per Annum"] if runs_col else np.nan,
+        }
+    )
+    nesting_summary = estimate_nesting(nest_items, sizes_df, nest_gap)
+
+    display_nesting = nesting_summary.copy()
+    for c in ["Sheets p.a.", "Roll Metres p.a.", "Item m²", "Stock m²", "Waste m²"]:
+        display_nesting[c] = display_nesting[c].round(1)
+    display_nesting["Yield %"] = display_nesting["Yield %"].round(1)
+    st.dataframe(display_nesting, use_container_width=True)
+
+    not_nested = len(data) - int(nesting_summary["Lines Nested"].sum())
+    if not_nested:
+        st.caption(f"{not_nested:,} lines not nested (missing dimensions, quantity or stock size).")
 
 # ---------------------------------------------------------
 # 5. Final calculated lines & export
@@ -662,7 +1166,104 @@ if "Value per Run (ex GST)" in display_data.columns:
 st.dataframe(display_data, use_container_width=True)
 
 # ---------------------------------------------------------
-# 6. KPI metrics (per annum and per run)
+# 6. Revision compare (reprice only the changed lines of the previous revision)
+# ---------------------------------------------------------
+
+revision_summary = None
+if prev_data is not None:
+    st.markdown("### 5. Revision changes")
+
+    changes, used_key_mode = diff_revisions(key_columns(prev_data), key_columns(data), key_mode)
+    if used_key_mode != key_mode:
+        st.warning("Lot ID is missing or repeated in one of the revisions — matching lines by content key instead.")
+    counts = changes["Change"].value_counts()
+    st.caption(
+        " · ".join(f"{label}: {int(counts.get(label, 0)):,}" for label in ["Added", "Removed", "Modified", "Unchanged"])
+    )
+
+    # Old side of the delta: only removed / modified lines from the previous revision are priced.
+    old_rows = changes.loc[changes["Change"].isin(["Removed", "Modified"]), "prev_row"].to_numpy(dtype=int)
+    old_lines = prev_data.iloc[old_rows].copy()
+    old_lines["Material Group"] = [
+        stock_to_group.get(s) or group_memory.get(s) or material_group_key_medium(s) for s in old_lines["Stock Name"]
+    ]
+    old_remembered = line_fingerprints(key_columns(prev_data)).iloc[old_rows].map(ds_overrides)
+    old_lines["Double Sided?"] = old_remembered.where(old_remembered.notna(), old_lines["Double Sided?"]).astype(bool)
+    old_lines = compute_line_values(old_lines, group_prices, stock_prices, double_mult)
+
+    # New side of the delta is already priced in `data`.
+    new_rows = changes.loc[changes["Change"].isin(["Added", "Modified"]), "curr_row"].to_numpy(dtype=int)
+    new_lines = data.iloc[new_rows]
+
+    old_change = changes.loc[changes["Change"].isin(["Removed", "Modified"]), "Change"].to_numpy()
+    new_change = changes.loc[changes["Change"].isin(["Added", "Modified"]), "Change"].to_numpy()
+    unchanged_rows = changes.loc[changes["Change"] == "Unchanged", "curr_row"].to_numpy(dtype=int)
+
+    delta = pd.concat(
+        [
+            pd.DataFrame(
+                {
+                    "Material Group": old_lines["Material Group"].to_numpy(),
+                    "Change": old_change,
+                    "Value Before": old_lines["Line Value (ex GST)"].to_numpy(),
+                    "Value After": 0.0,
+                    # Modified lines are counted once, on the new side.
+                    "Lines": (old_change == "Removed").astype(int),
+                }
+            ),
+            pd.DataFrame(
+                {
+                    "Material Group": new_lines["Material Group"].to_numpy(),
+                    "Change": new_change,
+                    "Value Before": 0.0,
+                    "Value After": new_lines["Line Value (ex GST)"].to_numpy(),
+                    "Lines": 1,
+                }
+            ),
+            pd.DataFrame(
+                {
+                    "Material Group": data["Material Group"].iloc[unchanged_rows].to_numpy(),
+                    "Change": "Unchanged",
+                    "Value Before": 0.0,
+                    "Value After": 0.0,
+                    "Lines": 1,
+                }
+            ),
+        ],
+        ignore_index=True,
+    )
+
+    line_counts = delta.pivot_table(
+        index="Material Group", columns="Change", values="Lines", aggfunc="sum", fill_value=0
+    ).reindex(columns=["Added", "Removed", "Modified", "Unchanged"], fill_value=0)
+
+    revision_summary = (
+        delta.groupby("Material Group")[["Value Before", "Value After"]]
+        .sum()
+        .join(line_counts)
+        .reset_index()
+    )
+    revision_summary["Value Impact (ex GST)"] = revision_summary["Value After"] - revision_summary["Value Before"]
+    revision_summary = revision_summary.sort_values(
+        "Value Impact (ex GST)", key=lambda v: v.abs(), ascending=False
+    ).reset_index(drop=True)
+
+    display_revision = revision_summary.copy()
+    for c in ["Value Before", "Value After", "Value Impact (ex GST)"]:
+        display_revision[c] = display_revision[c].apply(fmt_money)
+    display_revision = display_revision[
+        ["Material Group", "Added", "Removed", "Modified", "Unchanged", "Value Before", "Value After", "Value Impact (ex GST)"]
+    ]
+
+    st.markdown(
+        '<span class="orange-chip">Delta</span> Value Before / After only cover changed lines, priced at today\'s rates.',
+        unsafe_allow_html=True,
+    )
+    st.dataframe(display_revision, use_container_width=True)
+    st.metric("Net revision impact (ex GST)", fmt_money(revision_summary["Value Impact (ex GST)"].sum()))
+
+# ---------------------------------------------------------
+# 7. KPI metrics (per annum and per run)
 # ---------------------------------------------------------
 
 total_area = data["Total Area m²"].sum(skipna=True)
@@ -693,7 +1294,7 @@ if use_runs and runs_col:
         st.markdown("</div>", unsafe_allow_html=True)
 
 # ---------------------------------------------------------
-# 7. Save price memory & Excel export
+# 8. Save price memory & Excel export
 # ---------------------------------------------------------
 
 clean_group_prices = {k: float(v) for k, v in group_prices.items() if float(v) > 0}
@@ -704,6 +1305,9 @@ buffer = io.BytesIO()
 with pd.ExcelWriter(buffer, engine="xlsxwriter") as writer:
     data.to_excel(writer, index=False, sheet_name="Priced Tender")
     group_summary.to_excel(writer, index=False, sheet_name="Group Summary")
+    nesting_summary.to_excel(writer, index=False, sheet_name="Nesting")
+    if revision_summary is not None:
+        revision_summary.to_excel(writer, index=False, sheet_name="Revision Changes")
 
 st.download_button(
     "⬇️ Download priced tender as Excel",
@@ -0,0 +1,415 @@
+"""Concurrent-session load test for the Streamlit console (app.py).
+
+Drives app.py headlessly with Streamlit's app-testing API (``AppTest``). Each
+simulated estimator uploads a synthetic tender, then keeps rerunning the app
+while toggling double-sided boxes, changing prices, merging groups and
+switching the per-run view. The sessions of a level run as threads in one
+process, the same way a single ``streamlit run`` server executes its sessions.
+
+Each concurrency level runs in a fresh process, so levels can be given in any
+order, and every session uploads its own tender unless ``--same-tender`` is
+given. Reports per-rerun latency percentiles, throughput, RSS at level start
+and peak RSS for each level, and can append the results to a JSON-lines
+history file so capacity can be tracked over time.
+
+The harness relies on AppTest internals (``AppTest._run``, the element tree's
+widget states, ``Runtime.instance``, the local script runner's
+``ScriptCache``). It was written against Streamlit 1.66 and refuses to run if
+those internals are missing.
+
+    python loadtest.py --sessions 1,4,8 --lines 5000 --reruns 10
+    python loadtest.py --sessions 8 --lines 20000 --history loadtest_history.jsonl
+"""
+
+import argparse
+import gc
+import io
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+import streamlit
+from streamlit.proto.WidgetStates_pb2 import WidgetStates
+from streamlit.runtime.runtime import Runtime
+from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+from streamlit.runtime.state import SCRIPT_RUN_WITHOUT_ERRORS_KEY
+from streamlit.testing.v1 import AppTest, local_script_runner
+from streamlit.testing.v1.element_tree import ElementTree
+from streamlit.testing.v1.util import patch_config_options
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+APP_PATH = Path(__file__).with_name("app.py")
+TESTED_STREAMLIT = "1.66"
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+SYNTHETIC_STOCKS = [
+    "5mm Corflute, double sided",
+    "3mm ACM, single sided",
+    "10mm Screenboard",
+    "3mm PVC",
+    "Avery MPI 2126 SAV, gloss laminate",
+    "Arlon 5000 SAV",
+    "3M 480 SAV",
+    "Metamark SAV, double sided",
+    "250gsm Gloss, double sided",
+    "350gsm Silk",
+    "Duratran Backlit Film",
+    "Yuppo Synthetic 200mic",
+    "Mactac Glass Decor",
+]
+SYNTHETIC_SIZES = [
+    "297mm x 420mm",
+    "420mm x 594mm",
+    "594mm x 841mm",
+    "841mm x 1189mm",
+    "600mm x 900mm",
+    "1000mm x 2000mm",
+    "2400mm x 1200mm",
+    "90mm x 55mm",
+]
+
+
+# ---------------------------------------------------------
+# Synthetic tenders
+# ---------------------------------------------------------
+
+
+def synthetic_tender(lines: int, seed: int = 0) -> bytes:
+    """An .xlsx tender with the columns app.py expects."""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame(
+        {
+            "Lot ID": np.arange(1, lines + 1),
+            "Item Description": [f"Item {i}" for i in range(1, lines + 1)],
+            "Dimensions": rng.choice(SYNTHETIC_SIZES, lines),
+            "Print/Stock Specifications": rng.choice(SYNTHETIC_STOCKS, lines),
+            "Total Annual Volume": rng.integers(1, 2000, lines),
+            "Approx Runs p.a": rng.choice([1, 2, 4, 12], lines),
+        }
+    )
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine="xlsxwriter") as writer:
+        df.to_excel(writer, index=False)
+    return buffer.getvalue()
+
+
+# ---------------------------------------------------------
+# One simulated estimator
+# ---------------------------------------------------------
+
+
+class Session:
+    """One browser session: an AppTest instance plus the edits it has made.
+
+    AppTest has no driver for ``st.data_editor``, so double-sided edits are
+    sent as raw widget states on every rerun, the same way the browser
+    resends them. Every edit must still be visible in the priced lines after
+    the next rerun; one that is not counts as a lost edit (and an error).
+    """
+
+    def __init__(self, tender: bytes, seed: int, timeout: float):
+        self.at = AppTest.from_file(str(APP_PATH), default_timeout=timeout)
+        self.tender = tender
+        self.rng = random.Random(seed)
+        self.editor_edits = {}
+        self.latencies = []
+        self.errors = 0
+        self.lost_edits = 0
+
+    def _find_dataframe(self, match):
+        return next((d for d in self.at.dataframe if match(d)), None)
+
+    def _editor(self):
+        return self._find_dataframe(lambda d: bool(d.key) and d.key.startswith("double_sided_editor"))
+
+    def rerun(self, record: bool = True):
+        states = self.at._tree.get_widget_states() if self.at._tree is not None else WidgetStates()
+        editor = self._editor() if self.editor_edits else None
+        if editor is not None:
+            w = states.widgets.add()
+            w.id = editor.proto.id
+            w.string_value = json.dumps({"edited_rows": self.editor_edits, "added_rows": [], "deleted_rows": []})
+        start = time.perf_counter()
+        try:
+            self.at._run(states)
+            failed = bool(self.at.exception) or not self.at.session_state[SCRIPT_RUN_WITHOUT_ERRORS_KEY]
+        except Exception:  # e.g. rerun timeout
+            failed = True
+        if record:
+            self.latencies.append(time.perf_counter() - start)
+            self.errors += failed
+
+    def upload(self):
+        # Warm-up: the app only reaches st.stop() before a file is uploaded.
+        self.rerun(record=False)
+        self.at.file_uploader[0].set_value(("tender.xlsx", self.tender, XLSX_MIME))
+        self.rerun()
+
+    def toggle_double_sided(self):
+        editor = self._editor()
+        if editor is None:
+            return
+        row = str(self.rng.randrange(len(editor.value)))
+        current = self.editor_edits.get(row, {}).get("Double Sided?", bool(editor.value["Double Sided?"].iloc[int(row)]))
+        self.editor_edits[row] = {"Double Sided?": not current}
+
+    def check_edits(self):
+        """Count double-sided edits that did not reach the priced lines."""
+        priced = self._find_dataframe(lambda d: "Sided Multiplier" in d.value.columns)
+        if priced is None:
+            lost = len(self.editor_edits)
+        else:
+            sides = priced.value["Double Sided?"]
+            lost = sum(bool(sides.iloc[int(row)]) != edit["Double Sided?"] for row, edit in self.editor_edits.items())
+        self.lost_edits += lost
+        self.errors += bool(lost)
+
+    def change_price(self):
+        prices = [n for n in self.at.number_input if n.key and n.key.startswith("price_group_")]
+        if prices:
+            self.rng.choice(prices).set_value(round(self.rng.uniform(5, 80), 1))
+
+    def merge_groups(self):
+        if not self.at.multiselect or not self.at.button:
+            return
+        options = list(self.at.multiselect[0].options)
+        if len(options) < 2:
+            return
+        self.at.multiselect[0].set_value(self.rng.sample(options, 2))
+        self.rerun()
+        self.at.button[0].click()
+
+    def toggle_runs(self):
+        if self.at.checkbox:
+            self.at.checkbox[0].set_value(not self.at.checkbox[0].value)
+
+    def work(self, reruns: int):
+        self.upload()
+        actions = [self.toggle_double_sided, self.change_price, self.change_price, self.merge_groups, self.toggle_runs]
+        for _ in range(reruns):
+            action = self.rng.choice(actions)
+            action()
+            self.rerun()
+            if action == self.toggle_double_sided:
+                self.check_edits()
+
+
+# ---------------------------------------------------------
+# Load levels
+# ---------------------------------------------------------
+
+
+@contextmanager
+def shared_server_state():
+    """Share the per-process pieces of a Streamlit server between session threads.
+
+    AppTest is written for one session at a time: each run compiles the script
+    into a fresh cache and installs a mock runtime that it clears when the run
+    ends. With several sessions in flight that pulls the runtime out from under
+    the others (and Python 3.11's compiler is not thread-safe), so, like a real
+    server, compile once into a shared script cache and keep the most recent
+    runtime available.
+    """
+    last = []
+    original = Runtime.__dict__["instance"].__func__
+
+    def instance(cls):
+        if cls._instance is not None:
+            last[:] = [cls._instance]
+            return cls._instance
+        if last:
+            return last[0]
+        return original(cls)
+
+    def exists(cls):
+        return cls._instance is not None or bool(last)
+
+    script_cache = ScriptCache()
+    script_cache.get_bytecode(str(APP_PATH))
+    with patch.object(Runtime, "instance", classmethod(instance)), patch.object(
+        Runtime, "exists", classmethod(exists)
+    ), patch("streamlit.testing.v1.local_script_runner.ScriptCache", lambda: script_cache):
+        yield
+
+
+def check_streamlit_internals():
+    """Fail fast if the AppTest internals this harness drives are missing."""
+    probe = AppTest.from_string("")
+    missing = [
+        name
+        for name, ok in [
+            ("AppTest._run", callable(getattr(AppTest, "_run", None))),
+            ("AppTest._tree", hasattr(probe, "_tree")),
+            ("ElementTree.get_widget_states", callable(getattr(ElementTree, "get_widget_states", None))),
+            ("Runtime.instance", isinstance(Runtime.__dict__.get("instance"), classmethod)),
+            ("Runtime.exists", isinstance(Runtime.__dict__.get("exists"), classmethod)),
+            ("Runtime._instance", hasattr(Runtime, "_instance")),
+            ("local_script_runner.ScriptCache", hasattr(local_script_runner, "ScriptCache")),
+        ]
+        if not ok
+    ]
+    if missing:
+        sys.exit(
+            f"loadtest.py needs Streamlit {TESTED_STREAMLIT}.x internals that are missing in "
+            f"Streamlit {streamlit.__version__}: {', '.join(missing)}. "
+            f"Install the pinned version from requirements.txt."
+        )
+    if not streamlit.__version__.startswith(TESTED_STREAMLIT + "."):
+        print(
+            f"warning: loadtest.py was tested with Streamlit {TESTED_STREAMLIT}.x, found {streamlit.__version__}",
+            file=sys.stderr,
+        )
+
+
+def rss_mb() -> float:
+    """Current resident set size of this process (MB)."""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    try:
+        with open("/proc/self/statm", encoding="ascii") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        return float("nan")
+
+
+@contextmanager
+def sample_peak_rss(interval: float = 0.05):
+    """Sample RSS in a background thread; yields a list holding the peak seen so far."""
+    peak = [rss_mb()]
+    done = threading.Event()
+
+    def sample():
+        while not done.wait(interval):
+            peak[0] = max(peak[0], rss_mb())
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    try:
+        yield peak
+    finally:
+        done.set()
+        sampler.join()
+        peak[0] = max(peak[0], rss_mb())
+
+
+def run_level(sessions: int, tenders: list, reruns: int, timeout: float, seed: int) -> dict:
+    """Run `sessions` concurrent sessions and summarise their rerun latencies.
+
+    Session i uploads ``tenders[i % len(tenders)]``.
+    """
+    workers = [Session(tenders[i % len(tenders)], seed + i, timeout) for i in range(sessions)]
+    barrier = threading.Barrier(sessions)
+
+    def drive(session):
+        barrier.wait()
+        session.work(reruns)
+
+    gc.collect()
+    rss_start = rss_mb()
+    start = time.perf_counter()
+    with sample_peak_rss() as peak, ThreadPoolExecutor(max_workers=sessions) as pool:
+        list(pool.map(drive, workers))
+    wall = time.perf_counter() - start
+
+    latencies = np.array([x for s in workers for x in s.latencies])
+    p50, p90, p95, p99 = np.percentile(latencies, [50, 90, 95, 99])
+    return {
+        "sessions": sessions,
+        "reruns": int(latencies.size),
+        "errors": sum(s.errors for s in workers),
+        "lost_edits": sum(s.lost_edits for s in workers),
+        "p50_s": round(float(p50), 3),
+        "p90_s": round(float(p90), 3),
+        "p95_s": round(float(p95), 3),
+        "p99_s": round(float(p99), 3),
+        "max_s": round(float(latencies.max()), 3),
+        "throughput_rps": round(latencies.size / wall, 2),
+        "wall_s": round(wall, 2),
+        "rss_start_mb": round(rss_start, 1),
+        "peak_rss_mb": round(peak[0], 1),
+        "rss_growth_mb": round(peak[0] - rss_start, 1),
+    }
+
+
+def run_level_isolated(sessions: int, lines: int, same_tender: bool, reruns: int, timeout: float, seed: int) -> dict:
+    """One concurrency level in a fresh process, so its RSS owes nothing to earlier levels."""
+    # Tenders are built before timing starts; one per session unless `same_tender`.
+    tenders = [synthetic_tender(lines, seed + i) for i in range(1 if same_tender else sessions)]
+    # The app saves price_memory.json in the working directory on every rerun;
+    # keep the load test away from the team's real price memory.
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir, patch_config_options({"global.appTest": True}), shared_server_state():
+        os.chdir(workdir)
+        try:
+            return run_level(sessions, tenders, reruns, timeout, seed)
+        finally:
+            os.chdir(cwd)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sessions", default="1,2,4,8", help="Comma-separated concurrency levels to run in turn.")
+    parser.add_argument("--lines", type=int, default=2000, help="Lines per synthetic tender.")
+    parser.add_argument("--reruns", type=int, default=10, help="Interactions (reruns) per session after upload.")
+    parser.add_argument("--timeout", type=float, default=300.0, help="Per-rerun timeout in seconds.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--same-tender",
+        action="store_true",
+        help="Upload one tender in every session (cached helpers then hit across sessions).",
+    )
+    parser.add_argument("--history", help="Append results as JSON lines to this file.")
+    args = parser.parse_args(argv)
+    check_streamlit_internals()
+
+    levels = [int(x) for x in args.sessions.split(",") if x.strip()]
+    history = Path(args.history).resolve() if args.history else None
+
+    results = []
+    spawn = multiprocessing.get_context("spawn")
+    for n in levels:
+        with spawn.Pool(1) as pool:
+            result = pool.apply(
+                run_level_isolated, (n, args.lines, args.same_tender, args.reruns, args.timeout, args.seed)
+            )
+        results.append(result)
+        print(
+            f"{n:>3} sessions | {result['reruns']:>5} reruns | "
+            f"p50 {result['p50_s']:.3f}s  p95 {result['p95_s']:.3f}s  p99 {result['p99_s']:.3f}s | "
+            f"{result['throughput_rps']:.2f} reruns/s | peak RSS {result['peak_rss_mb']:.0f} MB "
+            f"(+{result['rss_growth_mb']:.0f} MB) | "
+            f"errors {result['errors']} (lost edits {result['lost_edits']})",
+            flush=True,
+        )
+
+    if history:
+        stamp = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        with open(history, "a", encoding="utf-8") as f:
+            for result in results:
+                f.write(
+                    json.dumps({"timestamp": stamp, "lines": args.lines, "same_tender": args.same_tender, **result})
+                    + "\n"
+                )
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Revision compare: reordered and inserted lines must not show up as modified."""
+
+import io
+from pathlib import Path
+
+import pandas as pd
+import pytest
+from streamlit.testing.v1 import AppTest
+
+APP_PATH = Path(__file__).resolve().parents[1] / "app.py"
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+BASE = pd.DataFrame(
+    {
+        "Dimensions": ["600mm x 400mm"] * 5,
+        "Print/Stock Specifications": ["5mm Corflute"] * 5,
+        "Total Annual Volume": [10, 20, 30, 40, 50],
+    }
+)
+
+
+def to_xlsx(df: pd.DataFrame) -> bytes:
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine="xlsxwriter") as writer:
+        df.to_excel(writer, index=False)
+    return buffer.getvalue()
+
+
+def change_counts(prev: pd.DataFrame, curr: pd.DataFrame, key_mode: str = "Content key") -> str:
+    at = AppTest.from_file(str(APP_PATH), default_timeout=60)
+    at.run()
+    at.file_uploader[0].set_value(("current.xlsx", to_xlsx(curr), XLSX_MIME))
+    at.file_uploader[1].set_value(("previous.xlsx", to_xlsx(prev), XLSX_MIME))
+    at.radio[0].set_value(key_mode)
+    at.run()
+    assert not at.exception
+    return next(c.value for c in at.caption if c.value.startswith("Added:"))
+
+
+@pytest.fixture(autouse=True)
+def _workdir(tmp_path, monkeypatch):
+    # The app writes price_memory.json into the working directory.
+    monkeypatch.chdir(tmp_path)
+
+
+def test_reordered_lines_are_unchanged():
+    reversed_lines = BASE.iloc[::-1].reset_index(drop=True)
+    assert change_counts(BASE, reversed_lines) == "Added: 0 · Removed: 0 · Modified: 0 · Unchanged: 5"
+
+
+def test_inserted_line_is_added():
+    inserted = pd.concat([BASE.iloc[:1].assign(**{"Total Annual Volume": 99}), BASE], ignore_index=True)
+    assert change_counts(BASE, inserted) == "Added: 1 · Removed: 0 · Modified: 0 · Unchanged: 5"
+
+
+def test_volume_change_is_modified():
+    changed = BASE.copy()
+    changed.loc[2, "Total Annual Volume"] = 35
+    assert change_counts(BASE, changed) == "Added: 0 · Removed: 0 · Modified: 1 · Unchanged: 4"
+
+
+def test_blank_lot_ids_fall_back_to_content_key():
+    prev = BASE.assign(**{"Lot ID": [1, None, 3, None, 5]})
+    curr = prev.iloc[[0, 3, 2, 1, 4]].reset_index(drop=True)
+    assert change_counts(prev, curr, "Lot ID") == "Added: 0 · Removed: 0 · Modified: 0 · Unchanged: 5"